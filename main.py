@@ -1,14 +1,23 @@
 import streamlit as st
 import yfinance as yf
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import pandas as pd
+import numpy as np
 import re
+import ahocorasick
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import time
 
+# Precompiled patterns used by the news filter and symbol matcher
+_NORM_RE = re.compile(r'[^a-z0-9]')
+_POS_WORDS = ("order", "profit", "acquisition", "launch", "contract", "gains", "rises", "boost", "expands")
+_POS_RE = re.compile('|'.join(map(re.escape, _POS_WORDS)), re.IGNORECASE)
+
 # Set page config
 st.set_page_config(
     page_title="📈 NSE Stock News Analyzer",
@@ -55,109 +64,126 @@ def get_nse_stock_list():
     """
     Fetches the list of NSE listed stock symbols from the NSE India archives.
     Returns:
-        list: A list of stock symbols.
+        tuple: A list of stock symbols and a parallel list of their normalized forms.
     """
     url = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
     try:
-        df = pd.read_csv(url)
-        return [s.strip().upper() for s in df['SYMBOL'].tolist()]
+        df = pd.read_csv(url, usecols=['SYMBOL'], dtype={'SYMBOL': 'string'})
+        symbols = df['SYMBOL'].dropna().str.strip().str.upper()
+        normalized = symbols.str.lower().str.replace(_NORM_RE, '', regex=True)
+        return symbols.tolist(), normalized.tolist()
     except Exception as e:
         st.error(f"⚠️ Unable to fetch NSE stock list: {e}")
-        return []
+        return [], []
+
+# 🌐 Shared HTTP session
+@st.cache_resource
+def get_http_session():
+    """
+    Creates one pooled requests.Session per process so scrapes reuse keep-alive connections across reruns.
+    Returns:
+        requests.Session: A session with browser headers and retries configured.
+    """
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=Retry(total=2, backoff_factor=0.3)))
+    return session
 
 # 📰 2. Get latest positive news from MoneyControl
+@st.cache_data(ttl=300, show_spinner=False)  # Cache for 5 minutes
 def get_positive_news():
     """
     Fetches news headlines from MoneyControl and filters for positive keywords.
+    Errors are raised rather than returned so that failed fetches are not cached.
     Returns:
         list: A list of positive news headlines.
     """
     url = "https://www.moneycontrol.com/news/business/stocks/"
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        news = []
-        
-        for item in soup.find_all('li', class_='clearfix'):
-            headline_tag = item.find('h2')
-            if headline_tag:
-                headline = headline_tag.get_text(strip=True)
-                if any(word in headline.lower() for word in ["order", "profit", "acquisition", "launch", "contract", "gains", "rises", "boost", "expands"]):
-                    news.append(headline)
-        return news
-    except requests.exceptions.RequestException as e:
-        st.error(f"⚠️ Error fetching news from MoneyControl: {e}")
-        return []
-    except Exception as e:
-        st.error(f"⚠️ An unexpected error occurred while parsing news: {e}")
-        return []
+    response = get_http_session().get(url, timeout=10)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.content, "lxml")
+    news = []
+    
+    for headline_tag in soup.select('li.clearfix h2'):
+        headline = headline_tag.get_text(strip=True)
+        if _POS_RE.search(headline):
+            news.append(headline)
+    return news
 
 # 🏷️ 3. Match symbols from NSE stock list with news
-def extract_symbols_from_news(news_list, all_symbols, progress_bar=None):
+@st.cache_resource(ttl=3600)  # Shared across sessions, keyed on the symbol list
+def get_symbol_automaton(all_symbols, normalized_symbols):
+    """
+    Builds an Aho-Corasick automaton over the normalized NSE symbols.
+    Returns:
+        ahocorasick.Automaton: Maps each normalized symbol to (normalized_symbol, symbol, position).
+    """
+    automaton = ahocorasick.Automaton()
+    for position, (symbol, normalized_symbol) in enumerate(zip(all_symbols, normalized_symbols)):
+        if not normalized_symbol:
+            continue
+        # On a normalization collision keep the longer raw symbol, as the length-sorted scan did
+        existing = automaton.get(normalized_symbol, None)
+        if existing is None or len(symbol) > len(existing[1]):
+            automaton.add_word(normalized_symbol, (normalized_symbol, symbol, position))
+    automaton.make_automaton()
+    return automaton
+
+def extract_symbols_from_news(news_list, all_symbols, normalized_symbols, progress_bar=None):
     """
     Extracts stock symbols from news headlines using a more flexible normalization approach.
     """
-    matched = []
-    all_symbols_sorted = sorted(all_symbols, key=len, reverse=True)
+    matched = set()
+    automaton = get_symbol_automaton(all_symbols, normalized_symbols)
     
     total_news = len(news_list)
     
     for headline_idx, headline in enumerate(news_list):
-        if progress_bar:
+        # Throttle widget updates; each one is a round-trip to the browser
+        if progress_bar and (headline_idx % 10 == 0 or headline_idx + 1 == total_news):
             progress_bar.progress((headline_idx + 1) / total_news, 
                                 text=f"Processing news {headline_idx + 1}/{total_news}")
         
         lower_headline = headline.lower()
-        normalized_headline = re.sub(r'[^a-z0-9]', '', lower_headline)
+        normalized_headline = _NORM_RE.sub('', lower_headline)
         
-        for symbol in all_symbols_sorted:
-            lower_symbol = symbol.lower()
-            normalized_symbol = re.sub(r'[^a-z0-9]', '', lower_symbol)
-            
-            if not normalized_symbol:
-                continue
-                
-            if normalized_symbol in normalized_headline:
-                matched.append(symbol)
-                break
+        # Keep the longest symbol found in the headline, earliest in the NSE list on ties
+        hits = [value for _, value in automaton.iter(normalized_headline)]
+        if hits:
+            matched.add(max(hits, key=lambda hit: (len(hit[1]), -hit[2]))[1])
     
-    return list(set(matched))
-
-# 🔧 Symbol existence check
-def is_valid_symbol(symbol):
-    """
-    Checks if a stock symbol is valid and has market data available via yfinance.
-    """
-    try:
-        info = yf.Ticker(f"{symbol}.NS").info
-        return 'regularMarketPrice' in info and info['regularMarketPrice'] is not None
-    except Exception:
-        return False
+    return list(matched)
 
 # 📈 4. Get stock return % using yfinance
-def get_stock_performance(symbol):
+@st.cache_data(ttl=60, show_spinner=False)  # Cache for 1 minute
+def get_batch_performance(symbols):
     """
-    Retrieves the percentage change in stock price for the last two days using yfinance.
+    Retrieves the percentage change over the last two days for all symbols in one batched yfinance download.
+    Symbols without price data are dropped. A failed download raises so that it is not cached.
+    Returns:
+        pd.DataFrame: 'Stock' and 'Change %' columns, one row per symbol with data.
     """
-    try:
-        stock = yf.Ticker(f"{symbol}.NS")
-        hist = stock.history(period="2d")
-        
-        if hist.empty or len(hist) < 2:
-            return None
-            
-        yesterday_close = hist['Close'].iloc[-2]
-        today_close = hist['Close'].iloc[-1]
-        
-        if yesterday_close == 0:
-            return None
-            
-        change_percent = ((today_close - yesterday_close) / yesterday_close) * 100
-        return round(change_percent, 2)
-    except Exception:
-        return None
+    tickers = [f"{symbol}.NS" for symbol in symbols]
+    data = yf.download(tickers=tickers, period="2d", group_by='ticker', threads=True, progress=False, auto_adjust=False)
+    
+    if data.empty:
+        raise ValueError("No price data returned by Yahoo Finance")
+    
+    if isinstance(data.columns, pd.MultiIndex):
+        close = data.xs('Close', axis=1, level=1)
+        close.columns = close.columns.str.removesuffix('.NS')
+    else:
+        # Older yfinance releases return flat columns for a single ticker
+        close = data[['Close']].set_axis(symbols[:1], axis=1)
+    
+    # Dates are aligned across tickers, so rank each ticker's own closes from the latest backwards
+    valid = close.notna()
+    rank = valid[::-1].cumsum()[::-1]
+    last = close.where(valid & (rank == 1)).max()
+    prev = close.where(valid & (rank == 2)).max()
+    change = ((last / prev - 1) * 100).round(2)
+    change = change.replace([np.inf, -np.inf], np.nan).dropna()
+    return change.rename('Change %').reset_index(names='Stock')
 
 # 🧠 5. Full analysis runner
 def run_analysis(min_return_threshold=5.0):
@@ -178,7 +204,7 @@ def run_analysis(min_return_threshold=5.0):
     
     with progress_container:
         st.info("📥 Fetching NSE symbols...")
-        all_symbols = get_nse_stock_list()
+        all_symbols, normalized_symbols = get_nse_stock_list()
         if not all_symbols:
             st.error("❌ Could not fetch NSE symbols. Exiting analysis.")
             return results
@@ -187,7 +213,14 @@ def run_analysis(min_return_threshold=5.0):
         st.success(f"✅ Loaded {len(all_symbols)} symbols")
         
         st.info("🔄 Fetching latest positive news...")
-        news = get_positive_news()
+        try:
+            news = get_positive_news()
+        except requests.exceptions.RequestException as e:
+            st.error(f"⚠️ Error fetching news from MoneyControl: {e}")
+            news = []
+        except Exception as e:
+            st.error(f"⚠️ An unexpected error occurred while parsing news: {e}")
+            news = []
         if not news:
             st.error("❌ Could not fetch positive news. Exiting analysis.")
             return results
@@ -198,7 +231,7 @@ def run_analysis(min_return_threshold=5.0):
         
         st.info("🔍 Matching symbols from news...")
         progress_bar = st.progress(0, text="Processing news...")
-        matched_symbols = extract_symbols_from_news(news, all_symbols, progress_bar)
+        matched_symbols = extract_symbols_from_news(news, all_symbols, normalized_symbols, progress_bar)
         progress_bar.empty()
         
         if not matched_symbols:
@@ -209,28 +242,16 @@ def run_analysis(min_return_threshold=5.0):
         st.success(f"💡 Found {len(matched_symbols)} potential stocks from news")
         
         st.info("📊 Analyzing price changes...")
-        performance_progress = st.progress(0, text="Analyzing stock performance...")
-        
-        performance_data = []
-        total_symbols = len(matched_symbols)
-        
-        for idx, symbol in enumerate(matched_symbols):
-            performance_progress.progress((idx + 1) / total_symbols, 
-                                        text=f"Analyzing {symbol} ({idx + 1}/{total_symbols})")
-            
-            if not is_valid_symbol(symbol):
-                continue
-                
-            change = get_stock_performance(symbol)
-            if change is not None:
-                performance_data.append({'Stock': symbol, 'Change %': change})
-        
-        performance_progress.empty()
+        with st.spinner(f"Analyzing stock performance for {len(matched_symbols)} symbols..."):
+            try:
+                result_df = get_batch_performance(tuple(sorted(matched_symbols)))
+            except Exception as e:
+                st.error(f"⚠️ Unable to fetch price data: {e}")
+                result_df = pd.DataFrame(columns=['Stock', 'Change %'])
         
-        if performance_data:
-            result_df = pd.DataFrame(performance_data)
+        if not result_df.empty:
             filtered = result_df[result_df["Change %"] > min_return_threshold].sort_values(by="Change %", ascending=False)
-            results['performance_data'] = performance_data
+            results['performance_data'] = result_df.to_dict('records')
             results['filtered_stocks'] = filtered
     
     return results
@@ -296,7 +317,7 @@ def main():
             with tab1:
                 # Styled dataframe
                 styled_df = results['filtered_stocks'].copy()
-                styled_df['Change %'] = styled_df['Change %'].apply(lambda x: f"+{x}%" if x > 0 else f"{x}%")
+                styled_df['Change %'] = styled_df['Change %'].map("{:+.2f}%".format)
                 
                 st.dataframe(
                     styled_df,